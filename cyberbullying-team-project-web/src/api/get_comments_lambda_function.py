@@ -3,15 +3,140 @@ import json
 import random
 import os
 
+# Difficulty bands, from easiest to hardest
+DIFFICULTY_BANDS = ['easy', 'medium', 'hard']
+
+# Balanced block composition
+POSITIVE_PER_BLOCK = 4
+OTHER_PER_BLOCK = 6
+# Non-positive slots per block reserved for the player's weak area
+FOCUS_PER_BLOCK = 3
+
+
+def difficulty_band(attempts, incorrect):
+    """
+    Maps running answer counts to a difficulty band.
+    Uses a smoothed error rate, so unseen comments start as 'medium'.
+    """
+    error_rate = (incorrect + 1) / (attempts + 2)
+    if error_rate < 0.3:
+        return 'easy'
+    if error_rate < 0.6:
+        return 'medium'
+    return 'hard'
+
+
+def draw_comment(strata, category, band):
+    """
+    Removes and returns a random comment from the (category, band) stratum.
+    Falls back to the nearest difficulty band if the stratum is empty.
+    Returns None when the category is exhausted.
+    """
+    index = DIFFICULTY_BANDS.index(band)
+    order = sorted(range(len(DIFFICULTY_BANDS)), key=lambda i: (abs(i - index), -i))
+
+    for i in order:
+        pool = strata.get((category, DIFFICULTY_BANDS[i]))
+        if pool:
+            # Swap-remove keeps each draw O(1)
+            pick = random.randrange(len(pool))
+            pool[pick], pool[-1] = pool[-1], pool[pick]
+            return pool.pop()
+    return None
+
+
+def build_deck(results, deck_size=None, focus=None):
+    """
+    Builds a deck stratified by category and difficulty.
+    - Blocks of 4 positive + 6 non-positive comments
+    - Positive slots rotate through difficulty bands
+    - Non-positive slots rotate through bullying categories
+    - If focus is set (player's weak area), part of each block targets
+      hard comments from that category
+    Bucketing the fetched comments is O(N); each draw is then O(1),
+    so sampling the deck itself is O(deck size).
+    """
+    strata = {}
+    for comment in results:
+        key = (comment[3], difficulty_band(comment[4], comment[5]))
+        strata.setdefault(key, []).append(comment)
+
+    other_categories = sorted({status for status, _ in strata if status != 'positive'})
+    random.shuffle(other_categories)
+
+    if deck_size is None:
+        deck_size = len(results)
+    deck_size = min(deck_size, len(results))
+
+    deck = []
+    band_turn = 0
+    category_turn = 0
+    # Separate band rotation per category, so a category is not stuck on
+    # one band when the number of categories is a multiple of the bands
+    category_band_turn = {category: 0 for category in other_categories}
+
+    def draw_positive(band):
+        return draw_comment(strata, 'positive', band)
+
+    def draw_other(slot):
+        nonlocal category_turn
+        if focus in other_categories and slot < FOCUS_PER_BLOCK:
+            comment = draw_comment(strata, focus, 'hard')
+            if comment is not None:
+                return comment
+        # Round-robin over categories, dropping exhausted ones
+        while other_categories:
+            category = other_categories[category_turn % len(other_categories)]
+            band = DIFFICULTY_BANDS[category_band_turn[category] % len(DIFFICULTY_BANDS)]
+            comment = draw_comment(strata, category, band)
+            if comment is not None:
+                category_turn += 1
+                category_band_turn[category] += 1
+                return comment
+            other_categories.remove(category)
+        return None
+
+    while len(deck) < deck_size:
+        block = []
+        for slot in range(POSITIVE_PER_BLOCK):
+            if focus == 'positive' and slot < FOCUS_PER_BLOCK:
+                band = 'hard'
+            else:
+                band = DIFFICULTY_BANDS[band_turn % len(DIFFICULTY_BANDS)]
+                band_turn += 1
+            comment = draw_positive(band) or draw_other(slot)
+            if comment is not None:
+                block.append(comment)
+        for slot in range(OTHER_PER_BLOCK):
+            comment = draw_other(slot) or draw_positive('medium')
+            if comment is not None:
+                block.append(comment)
+
+        if not block:
+            break
+
+        # Shuffle each block so positive comments are not always first
+        random.shuffle(block)
+        deck.extend(block[:deck_size - len(deck)])
+
+    return deck
+
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler:
     - Connects to AWS RDS MySQL database
-    - Fetches all comments from COMMENT2 table
-    - Shuffles comments, grouping them to ensure balanced distribution:
+    - Fetches all comments from COMMENT2 table with their running
+      difficulty counts from COMMENT_DIFFICULTY
+    - Builds a deck stratified by category and difficulty, grouping
+      comments to ensure balanced distribution:
         * 4 positive comments
         * 6 non-positive comments
       (Repeated until not enough comments remain)
+    - Optional query parameters:
+        * focus: weak area from the previous result (e.g. 'gender')
+        * size: number of comments in the deck (positive integer,
+          capped at the number of comments; 400 if invalid)
     - Returns comments in JSON format with CORS headers
     """
 
@@ -20,7 +145,29 @@ def lambda_handler(event, context):
     db_user = os.environ.get("DB_USER")
     db_password = os.environ.get("DB_PASSWORD")
 
-    
+    headers = {
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+    }
+
+    # Read optional query parameters
+    # focus matches the 'problem' returned by post_result, which is untrimmed
+    params = (event or {}).get('queryStringParameters') or {}
+    focus = (params.get('focus') or '').strip() or None
+    deck_size = None
+    if params.get('size'):
+        try:
+            deck_size = int(params['size'])
+        except ValueError:
+            deck_size = 0
+        if deck_size < 1:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'size must be a positive integer'})
+            }
+
     # Connect to the RDS MySQL database
     connection = mysql.connector.connect(
         host=db_host,
@@ -29,60 +176,33 @@ def lambda_handler(event, context):
         database='cyberbullying'
     )
 
-    # Fetch comment fields
+    # Fetch comment fields with difficulty counts (unseen comments count as 0)
     cursor = connection.cursor()
-    cursor.execute("SELECT comment_id, comment_text, comment_fake_user, comment_status FROM COMMENT2")
+    cursor.execute(
+        "SELECT c.comment_id, c.comment_text, c.comment_fake_user, TRIM(c.comment_status), "
+        "COALESCE(d.attempts, 0), COALESCE(d.incorrect, 0) "
+        "FROM COMMENT2 c LEFT JOIN COMMENT_DIFFICULTY d ON c.comment_id = d.comment_id"
+    )
     results = cursor.fetchall()
-    # Shuffle original results
-    random.shuffle(results)
-
-    # Split into two groups based on comment_status
-    positive_comments = [comment for comment in results if comment[3] == 'positive']
-    other_comments = [comment for comment in results if comment[3] != 'positive']
-
-
-    shuffled_comments = []
-
-    # Create balanced blocks: 4 positive + 6 other
-    while len(positive_comments) >= 4 and len(other_comments) >= 6:
-        
-        block_positive = positive_comments[:4]
-        positive_comments = positive_comments[4:]
-        
-        
-        block_other = other_comments[:6]
-        other_comments = other_comments[6:]
-        
-        # Merge and shuffle each block
-        block = block_positive + block_other
-        random.shuffle(block)
-        
-        
-        shuffled_comments.extend(block)
 
-    # Add remaining comments (if any)
-    shuffled_comments.extend(positive_comments)
-    shuffled_comments.extend(other_comments)
+    # Build stratified deck
+    deck = build_deck(results, deck_size, focus)
 
     cursor.close()
     connection.close()
-    
+
     # Build API response
     return {
         'statusCode': 200,
-        'headers': {
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-        },
+        'headers': headers,
         # Convert each tuple into a JSON object
         'body': json.dumps({
-            
+
              'Comments': list(map(lambda x: {
                  'comment_id': x[0],
                  'comment_text': x[1],
                  'comment_fake_name': x[2],
-                 
-            }, results))
+
+            }, deck))
         })
-    }
\ No newline at end of file
+    }
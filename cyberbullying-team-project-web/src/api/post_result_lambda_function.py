@@ -12,6 +12,7 @@ def lambda_handler(event, context):
     - Calculate score and summary feedback.
     - Identify weak areas (e.g., gender bullying, positive comments, etc.).
     - Save submission + user responses into the database.
+    - Update running per-comment difficulty counts (COMMENT_DIFFICULTY).
     - Return score breakdown and mistakes to frontend.
     """
         
@@ -191,6 +192,17 @@ def lambda_handler(event, context):
         sql = f"INSERT INTO RESPONSE (comment_id, submission_id, response_status, response_time, correctness) VALUES (%s, %s, %s, %s, %s)"
         cursor.execute(sql, (dic['comment_id'], submission_id, dic['response_status'], dic['response_time'], dic['answer']))
 
+    # Update running difficulty counts per comment (schema in README).
+    # Counts are incremented in place, so RESPONSE never needs to be rescanned.
+    sql = (
+        "INSERT INTO COMMENT_DIFFICULTY (comment_id, attempts, incorrect) VALUES (%s, 1, %s) "
+        "ON DUPLICATE KEY UPDATE attempts = attempts + 1, incorrect = incorrect + VALUES(incorrect)"
+    )
+    cursor.executemany(sql, [
+        (dic['comment_id'], 1 if dic['answer'] == 'incorrect' else 0)
+        for dic in body['submission']
+    ])
+
     connection.commit()
 
     # fetch the count of the total number of submissions
@@ -1,8 +1,22 @@
 from fastapi import FastAPI
 import gradio as gr
-from toxicity_model import check_toxicity, is_custom_toxic, check_sentiment, paraphrase_text, paraphrase_text_local, check_cyberbullying_with_hatebert, is_person_or_pronoun
+import os
+import torch
+
+# With several workers the parent must not start a multi-threaded OpenMP
+# pool before forking: workers forked after that hang in their first
+# multi-threaded inference. Keep the parent single-threaded while the
+# models load; each worker sets its own thread count after the fork.
+if int(os.getenv("WEB_WORKERS", "1")) > 1:
+    torch.set_num_threads(1)
+
+from toxicity_model import check_toxicity, is_custom_toxic, check_sentiment, paraphrase_text, paraphrase_text_local, check_cyberbullying_with_hatebert, is_person_or_pronoun, is_confident_green
 import mysql.connector
 import threading
+import gc
+import socket
+import signal
+import time
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -25,17 +39,23 @@ db_config = {
     'database': 'cyberbullying'
 }
 
+# Set DB_LOGGING=0 to skip logging (e.g. when benchmarking)
+DB_LOGGING = os.getenv("DB_LOGGING", "1") == "1"
+
 # Database logging
 def log_to_rds(text, is_bullying, tox_score, sentiment_score, suggested,  person_or_pronoun, cyberbullying_flag, zone_db, likelihood, comment):
     """
     Logs analyzed message data into MySQL database.
     """
+    if not DB_LOGGING:
+        return
     try:
         connection = mysql.connector.connect(**db_config)
         cursor = connection.cursor()
 
-        tox_score = float(tox_score)
-        sentiment_score = float(sentiment_score)
+        # Scores are None (NULL) when the cascade skipped the ensemble
+        tox_score = None if tox_score is None else float(tox_score)
+        sentiment_score = None if sentiment_score is None else float(sentiment_score)
 
         insert_query = """
         INSERT INTO MESSAGE (text, is_bullying, toxicity_score, sentiment_score, suggested_text, person_or_pronoun, cyberbullying_flag, zone, likelihood, comment)
@@ -47,8 +67,8 @@ def log_to_rds(text, is_bullying, tox_score, sentiment_score, suggested,  person
             tox_score,
             sentiment_score,
             suggested or "",
-            int(person_or_pronoun),
-            int(cyberbullying_flag),
+            None if person_or_pronoun is None else int(person_or_pronoun),
+            None if cyberbullying_flag is None else int(cyberbullying_flag),
             zone_db,
             likelihood,
             comment
@@ -136,11 +156,20 @@ async def analyze_api(request: TextRequest):
     text = request.text  # Access the 'text' from the request body
 
     # Perform analysis
-    tox_score = round(check_toxicity(text),2)
-    sent_score = round(check_sentiment(text), 2)
     custom_flag = is_custom_toxic(text)
-    person_or_pronoun = is_person_or_pronoun(text)
-    cyberbullying_flag = check_cyberbullying_with_hatebert(text)
+    cascaded = not custom_flag and is_confident_green(text)
+    if cascaded:
+        # Cascade: first-stage model is confident, skip the transformer ensemble
+        # (zero scores only drive the zone logic below, they are not logged)
+        tox_score = 0.0
+        sent_score = 0.0
+        person_or_pronoun = False
+        cyberbullying_flag = 0.0
+    else:
+        tox_score = round(check_toxicity(text),2)
+        sent_score = round(check_sentiment(text), 2)
+        person_or_pronoun = is_person_or_pronoun(text)
+        cyberbullying_flag = check_cyberbullying_with_hatebert(text)
     is_bullying =  custom_flag or tox_score >= 0.4 or cyberbullying_flag >=0.5
 
     # Determine severity zone
@@ -169,7 +198,9 @@ async def analyze_api(request: TextRequest):
     suggested_text = paraphrase_text(text) if is_bullying else None
     suggested_text = str(suggested_text)
 
-    # Log analysis to RDS
+    # Log analysis to RDS (NULL model scores mark cascaded messages)
+    if cascaded:
+        tox_score = sent_score = person_or_pronoun = cyberbullying_flag = None
     log_to_rds(text, is_bullying, tox_score, sent_score, suggested_text, person_or_pronoun, cyberbullying_flag, zone_db, likelihood, comment)
 
     # Convert tox_score and sent_score to float
@@ -189,6 +220,10 @@ async def analyze_api(request: TextRequest):
 
 # Run FastAPI (and optionally Gradio)
 def run():
+    """
+    Starts the API on PORT (default 7860).
+    WEB_WORKERS > 1 starts several worker processes (see run_workers).
+    """
     #import uvicorn
     # Run FastAPI in background thread
     #threading.Thread(target=lambda: uvicorn.run(app, host="0.0.0.0", port=8000)).start()
@@ -197,7 +232,128 @@ def run():
     #start_gradio()
     #threading.Thread(target=start_gradio).start()
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=7860)
+    port = int(os.getenv("PORT", "7860"))
+    workers = int(os.getenv("WEB_WORKERS", "1"))
+    if workers > 1:
+        run_workers(workers, port)
+    else:
+        # Same thread cap as the multi-worker path, so benchmarks compare like with like
+        torch.set_num_threads(torch_threads(1))
+        uvicorn.run(app, host="0.0.0.0", port=port)
+
+# Worker supervision: a worker that dies within WORKER_STARTUP_GRACE seconds
+# counts as a startup crash; restarts back off and give up after
+# WORKER_MAX_STARTUP_CRASHES crashes in a row
+WORKER_STARTUP_GRACE = 30
+WORKER_MAX_STARTUP_CRASHES = 5
+WORKER_MAX_BACKOFF = 30
+
+def torch_threads(workers):
+    """
+    Torch threads per worker: TORCH_THREADS, or an equal share of CPU cores.
+    """
+    return int(os.getenv("TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+
+def run_workers(workers, port):
+    """
+    Pre-fork serving: models are already loaded by the toxicity_model import,
+    so forked workers share the model weights copy-on-write instead of
+    loading their own copy. Each worker gets an equal share of CPU cores
+    for torch (TORCH_THREADS overrides it) so workers don't oversubscribe.
+    Workers that exit unexpectedly are logged and re-forked, with backoff
+    if they keep crashing on startup.
+    """
+    import uvicorn
+    import traceback
+
+    threads = torch_threads(workers)
+
+    # Shared listening socket, inherited by every worker
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("0.0.0.0", port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Move loaded objects out of GC tracking so collections in workers
+    # don't touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    def start_worker():
+        pid = os.fork()
+        if pid == 0:
+            # The child must never return into the supervisor loop below
+            code = 1
+            try:
+                # Default signal handling until uvicorn installs its own
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                os.environ["TOKENIZERS_PARALLELISM"] = "false"
+                torch.set_num_threads(threads)
+                server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+                server.run(sockets=[sock])
+                # Server.run returns without raising if startup failed
+                code = 0 if server.started else 3
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        children[pid] = time.time()
+        # Shutdown may have been requested while forking
+        if stopping:
+            os.kill(pid, signal.SIGTERM)
+
+    children = {}
+    stopping = False
+    gave_up = False
+
+    # Forward shutdown signals to workers
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        start_worker()
+    print(f"Started {workers} workers on port {port} with {threads} torch threads each")
+
+    # Supervise workers: re-fork any that exit while the server is running
+    startup_crashes = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if time.time() - started < WORKER_STARTUP_GRACE:
+            startup_crashes += 1
+        else:
+            startup_crashes = 0
+        if startup_crashes >= WORKER_MAX_STARTUP_CRASHES:
+            print(f"Worker {pid} exited (exit code {code}); {startup_crashes} startup crashes in a row, shutting down")
+            gave_up = True
+            stop(None, None)
+            continue
+        delay = min(2 ** startup_crashes, WORKER_MAX_BACKOFF) if startup_crashes else 1
+        print(f"Worker {pid} exited unexpectedly (exit code {code}), restarting in {delay}s")
+        deadline = time.time() + delay
+        while not stopping and time.time() < deadline:
+            time.sleep(0.5)
+        if not stopping:
+            start_worker()
+    sock.close()
+    if gave_up:
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmark of /analyze throughput and memory vs. number of workers.
+# Usage:
+#   python benchmark_workers.py [--workers 1 2 4 8] [--concurrency 32] [--duration 60] [--paraphrase off]
+# Each run starts app.py with WEB_WORKERS=n and DB_LOGGING=0 on a free port.
+# Most sample comments are bullying and trigger paraphrasing, so it is off by
+# default; otherwise Gemini latency and quota would dominate the results.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(SRC_DIR, "app.py")
+# Not imported from train_first_stage, which would load all models in the client
+COMMENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(SRC_DIR)), "cyberbullying-team-project-web", "data", "comments3.csv")
+
+
+def load_texts(path):
+    """
+    Loads sample messages from comments3.csv.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [row["comment_text"] for row in csv.DictReader(f)]
+
+
+def process_tree(pid):
+    """
+    Returns pid and all its child pids (Linux /proc).
+    """
+    pids = [pid]
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                pids.extend(int(c) for c in f.read().split())
+        except FileNotFoundError:
+            pass
+    return pids
+
+
+def memory_mb(pid):
+    """
+    Memory of the server process tree in MB.
+    RSS counts shared model weights once per worker, PSS splits them
+    between workers, so PSS is the real memory footprint.
+    """
+    rss = pss = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return rss / 1024, pss / 1024
+
+
+def post(url, text):
+    """
+    Sends one /analyze request and returns its latency in seconds.
+    """
+    data = json.dumps({"text": text}).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def wait_until_ready(url, server, timeout):
+    """
+    Polls the API until the models are loaded and it answers.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            post(url, "hello")
+            return
+        except OSError:
+            time.sleep(2)
+    raise RuntimeError("Server did not start in time")
+
+
+def run_benchmark(workers, texts, concurrency, duration, port, startup_timeout, paraphrase):
+    """
+    Starts the API with the given number of workers and measures
+    throughput, latency and memory under concurrent load.
+    """
+    env = dict(os.environ, WEB_WORKERS=str(workers), PORT=str(port), DB_LOGGING="0", PARAPHRASE_MODE=paraphrase)
+    server = subprocess.Popen([sys.executable, APP_PATH], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/analyze"
+    try:
+        wait_until_ready(url, server, startup_timeout)
+
+        # Warm up every worker
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda t: post(url, t), texts[:concurrency]))
+
+        latencies = []
+        errors = 0
+        deadline = time.time() + duration
+
+        def client(offset):
+            nonlocal errors
+            i = offset
+            while time.time() < deadline:
+                try:
+                    latencies.append(post(url, texts[i % len(texts)]))
+                except OSError:
+                    errors += 1
+                i += concurrency
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(client, range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        rss, pss = memory_mb(server.pid)
+        latencies.sort()
+        return {
+            "workers": workers,
+            "paraphrase": paraphrase,
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / elapsed,
+            "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "rss_mb": rss,
+            "pss_mb": pss,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /analyze throughput vs. worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to test")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=int, default=60, help="Seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=7861, help="Port for the benchmark server")
+    parser.add_argument("--startup-timeout", type=int, default=600, help="Seconds to wait for models to load")
+    parser.add_argument("--comments", default=COMMENTS_PATH, help="Path to comments3.csv")
+    parser.add_argument("--paraphrase", choices=["off", "local", "gemini"], default="off", help="Paraphrasing used by the server (PARAPHRASE_MODE)")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    texts = load_texts(args.comments)
+    results = []
+    print(f"Paraphrasing: {args.paraphrase}")
+    print(f"{'workers':>8} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'RSS MB':>9} {'PSS MB':>9} {'errors':>7}")
+    for workers in args.workers:
+        r = run_benchmark(workers, texts, args.concurrency, args.duration, args.port, args.startup_timeout, args.paraphrase)
+        results.append(r)
+        print(f"{r['workers']:>8} {r['throughput']:>8.2f} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['rss_mb']:>9.0f} {r['pss_mb']:>9.0f} {r['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from detoxify import Detoxify
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline , AutoModelForSequenceClassification, RobertaTokenizer, RobertaForSequenceClassification
 import re
 import json
+import math
+import zlib
 import google.generativeai as genai
 import os
 import spacy
@@ -11,6 +13,9 @@ import torch.nn.functional as F
 # Configure Google Gemini API
 genai.configure(api_key=os.getenv("GENIE_API_KEY"))
 
+# Paraphrasing: "gemini" (Gemini with local fallback), "local" (BART only) or "off"
+PARAPHRASE_MODE = os.getenv("PARAPHRASE_MODE", "gemini")
+
 # Load custom toxic phrases and modifiers from JSON
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -108,13 +113,19 @@ def paraphrase_text(text):
     """
     Paraphrases text using Google Gemini API with a fallback
     to local model if the API fails.
+    PARAPHRASE_MODE=local uses only the local model, PARAPHRASE_MODE=off disables paraphrasing.
     
     Args:
         text (str): Input text.
     
     Returns:
-        str: Paraphrased text.
+        str: Paraphrased text (None if paraphrasing is off).
     """
+    if PARAPHRASE_MODE == "off":
+        return None
+    if PARAPHRASE_MODE == "local":
+        return paraphrase_text_local(text)
+
     prompt = (
         f"Rewrite the following social media comment to keep the meaning very close to the original without adding or removing key ideas. "
         f"The rewritten version should be concise, not exceeding twice the length of the original. "
@@ -189,4 +200,168 @@ def is_person_or_pronoun(text):
         if token.ent_type_ == "PERSON" or re.match(r"^@", token.text):  # @username
             return True
         
-    return False
\ No newline at end of file
+    return False
+
+
+# Cascaded mode: cheap first-stage scorer gating the transformer ensemble
+# Enabled with CASCADE_MODE=1 once data/first_stage_model.json has been trained
+# (see train_first_stage.py)
+FIRST_STAGE_PATH = os.path.join(BASE_DIR, "data", "first_stage_model.json")
+FIRST_STAGE_DIM = 2 ** 18
+CASCADE_MODE = os.getenv("CASCADE_MODE", "0") == "1"
+
+def tokenize(text):
+    """
+    Splits text into lowercased word and symbol tokens.
+    Unicode-aware, so emoji and non-Latin text are kept as tokens.
+    
+    Args:
+        text (str): Input text.
+    
+    Returns:
+        list: Tokens (words, and each non-space symbol on its own).
+    """
+    return re.findall(r"\w+|[^\w\s]", text.lower())
+
+def hash_index(gram):
+    """
+    Maps an n-gram to a hashed feature index and sign.
+    crc32 is stable across processes, unlike hash().
+    """
+    h = zlib.crc32(gram.encode("utf-8"))
+    return h % FIRST_STAGE_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+def token_indices(text):
+    """
+    Hashed indices of the text's unigram tokens (the vocabulary check).
+    
+    Args:
+        text (str): Input text.
+    
+    Returns:
+        dict: Feature index -> token.
+    """
+    return {hash_index("w:" + t)[0]: t for t in tokenize(text)}
+
+def hash_features(text):
+    """
+    Converts text into hashed word uni/bigram and character trigram features.
+    Character trigrams are built from the raw lowercased text.
+    
+    Args:
+        text (str): Input text.
+    
+    Returns:
+        dict: Feature index -> L2-normalised signed count.
+    """
+    tokens = tokenize(text)
+    grams = ["w:" + t for t in tokens]
+    grams += [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    padded = f" {' '.join(text.lower().split())} "
+    grams += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    features = {}
+    for g in grams:
+        index, sign = hash_index(g)
+        features[index] = features.get(index, 0.0) + sign
+
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {i: v / norm for i, v in features.items()}
+
+def first_stage_score(text, weights, bias):
+    """
+    Scores text with the hashed n-gram linear model.
+    
+    Args:
+        text (str): Input text.
+        weights (dict): Feature index -> weight.
+        bias (float): Model bias.
+    
+    Returns:
+        float: Probability that the text needs the full ensemble.
+    """
+    return first_stage_probability(hash_features(text), weights, bias)
+
+def first_stage_probability(features, weights, bias):
+    """
+    Applies the linear model to already hashed features.
+    
+    Args:
+        features (dict): Output of hash_features.
+        weights (dict): Feature index -> weight.
+        bias (float): Model bias.
+    
+    Returns:
+        float: Sigmoid probability.
+    """
+    z = bias + sum(weights.get(i, 0.0) * v for i, v in features.items())
+    z = max(min(z, 30.0), -30.0)
+    return 1.0 / (1.0 + math.exp(-z))
+
+def first_stage_unseen_tokens(text, vocab):
+    """
+    Finds tokens the first stage never saw in training.
+    
+    Args:
+        text (str): Input text.
+        vocab (set): Hashed unigram indices seen in training.
+    
+    Returns:
+        list: Unseen tokens (words, emoji, non-Latin characters).
+    """
+    return [t for i, t in token_indices(text).items() if i not in vocab]
+
+def first_stage_is_green(text, model):
+    """
+    Applies the cascade gate to text.
+    
+    Args:
+        text (str): Input text.
+        model (dict): Weights, bias, threshold and vocab.
+    
+    Returns:
+        bool: True if the ensemble can be skipped, else False.
+    """
+    # The linear model knows nothing about unseen tokens (new insults, emoji,
+    # non-Latin text), so any of them, or no tokens at all, escalates
+    if not tokenize(text) or first_stage_unseen_tokens(text, model["vocab"]):
+        return False
+    return first_stage_probability(hash_features(text), model["weights"], model["bias"]) < model["threshold"]
+
+def load_first_stage(path=FIRST_STAGE_PATH):
+    """
+    Loads trained first-stage weights and calibrated threshold.
+    
+    Args:
+        path (str): Path to the JSON model file.
+    
+    Returns:
+        dict or None: Model with weights, bias, threshold and vocab, or None if missing.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        data = json.load(f)
+    data["weights"] = {int(i): w for i, w in data["weights"].items()}
+    # Older model files without a vocabulary never skip the ensemble
+    data["vocab"] = set(data.get("vocab", []))
+    return data
+
+first_stage = load_first_stage() if CASCADE_MODE else None
+if CASCADE_MODE and first_stage is None:
+    print(f"Cascade mode requested but {FIRST_STAGE_PATH} not found, using full ensemble")
+
+def is_confident_green(text):
+    """
+    Checks if the first-stage model is confident the text is Green Zone,
+    so the transformer ensemble can be skipped.
+    
+    Args:
+        text (str): Input text.
+    
+    Returns:
+        bool: True if text can be routed straight to Green Zone, else False.
+    """
+    if first_stage is None:
+        return False
+    return first_stage_is_green(text, first_stage)
@@ -0,0 +1,261 @@
+import argparse
+import csv
+import json
+import os
+import random
+import mysql.connector
+from toxicity_model import BASE_DIR, FIRST_STAGE_PATH, FIRST_STAGE_DIM, hash_features, token_indices, first_stage_probability, first_stage_unseen_tokens, first_stage_is_green, check_toxicity, is_custom_toxic, check_cyberbullying_with_hatebert
+
+# Offline training, calibration and evaluation of the cascade first stage.
+# Usage:
+#   python train_first_stage.py [--comments PATH] [--from-db] [--target-recall 1.0] [--holdout 0.3]
+# --from-db reads logged MESSAGE rows using DB_HOST, DB_USER and DB_PASSWORD.
+
+COMMENTS_PATH = os.path.join(os.path.dirname(BASE_DIR), "cyberbullying-team-project-web", "data", "comments3.csv")
+REPORT_PATH = os.path.join(BASE_DIR, "data", "first_stage_report.json")
+
+# Insults, emoji and non-Latin text that are not in the training data.
+# Appended to held-out Green texts, each probe must be escalated.
+PROBES = ["moron", "retard", "ты урод", "🖕🖕", "死ね"]
+
+
+def ensemble_zone(text):
+    """
+    Assigns the zone using the full ensemble (same thresholds as app.py).
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        str: Zone name as stored in the database.
+    """
+    tox_score = round(check_toxicity(text), 2)
+    cyberbullying_flag = check_cyberbullying_with_hatebert(text)
+    if is_custom_toxic(text) or tox_score >= 0.7 or cyberbullying_flag >= 0.7:
+        return 'Red Zone'
+    if tox_score >= 0.4 or cyberbullying_flag >= 0.4:
+        return 'Orange Zone'
+    if tox_score >= 0.2 or cyberbullying_flag >= 0.2:
+        return 'Yellow Zone'
+    return 'Green Zone'
+
+
+def load_comments(path):
+    """
+    Loads game comments and scores them with the full ensemble.
+
+    Args:
+        path (str): Path to comments3.csv.
+
+    Returns:
+        list: Examples as dicts with text, zone and human label.
+    """
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            text = row["comment_text"]
+            examples.append({
+                "text": text,
+                "zone": ensemble_zone(text),
+                "human_bullying": row["comment_status"].strip() != "positive",
+            })
+    return examples
+
+
+def load_messages():
+    """
+    Loads messages logged by the API together with the zone they were given.
+    Rows routed by the cascade are logged with NULL scores and are skipped,
+    so the first stage is never trained on its own output.
+
+    Returns:
+        list: Examples as dicts with text, zone and human label.
+    """
+    connection = mysql.connector.connect(
+        host=os.environ.get("DB_HOST"),
+        user=os.environ.get("DB_USER"),
+        password=os.environ.get("DB_PASSWORD"),
+        database='cyberbullying'
+    )
+    cursor = connection.cursor()
+    cursor.execute("SELECT text, zone FROM MESSAGE WHERE toxicity_score IS NOT NULL")
+    results = cursor.fetchall()
+    cursor.close()
+    connection.close()
+    return [{"text": text, "zone": zone, "human_bullying": False} for text, zone in results]
+
+
+def needs_ensemble(example):
+    """
+    Training target: escalate anything the ensemble puts outside Green Zone,
+    or that a human labelled as bullying.
+    """
+    return example["zone"] != "Green Zone" or example["human_bullying"]
+
+
+def train(texts, labels, epochs=30, lr=0.5, l2=1e-4, seed=0):
+    """
+    Trains a logistic regression on hashed features with SGD.
+    Positive examples are up-weighted to balance the classes.
+
+    Args:
+        texts (list): Training texts.
+        labels (list): 1 if the text needs the ensemble, else 0.
+
+    Returns:
+        tuple: (weights dict, bias).
+    """
+    rng = random.Random(seed)
+    features = [hash_features(t) for t in texts]
+    n_pos = sum(labels) or 1
+    n_neg = (len(labels) - sum(labels)) or 1
+    pos_weight = n_neg / n_pos
+
+    weights = {}
+    bias = 0.0
+    order = list(range(len(texts)))
+    for _ in range(epochs):
+        rng.shuffle(order)
+        for k in order:
+            x, y = features[k], labels[k]
+            p = first_stage_probability(x, weights, bias)
+            grad = (p - y) * (pos_weight if y else 1.0)
+            for i, v in x.items():
+                w = weights.get(i, 0.0)
+                weights[i] = w - lr * (grad * v + l2 * w)
+            bias -= lr * grad
+    return weights, bias
+
+
+def split_holdout(labels, holdout, seed=0):
+    """
+    Stratified split into training and calibration indices.
+    """
+    rng = random.Random(seed)
+    train_idx, holdout_idx = [], []
+    for label in (0, 1):
+        index = [i for i, y in enumerate(labels) if y == label]
+        rng.shuffle(index)
+        cut = int(round(len(index) * holdout))
+        holdout_idx += index[:cut]
+        train_idx += index[cut:]
+    return train_idx, holdout_idx
+
+
+def calibrate(texts, labels, model, target_recall, margin, min_known):
+    """
+    Picks the Green Zone threshold on held-out texts scored by the saved model,
+    so at least target_recall of the texts that need the ensemble are escalated,
+    then tightens it by margin. Texts with unseen tokens are always escalated,
+    so only fully known texts can be missed. With fewer than min_known such
+    bullying texts the threshold is not trustworthy and nothing is skipped.
+
+    Returns:
+        float: Threshold; known texts scoring below it skip the ensemble.
+    """
+    n_pos = sum(labels)
+    known = sorted(
+        first_stage_probability(hash_features(t), model["weights"], model["bias"])
+        for t, y in zip(texts, labels)
+        if y and not first_stage_unseen_tokens(t, model["vocab"])
+    )
+    # Too little known bullying text to calibrate against: never skip
+    if len(known) < min_known:
+        return 0.0
+    allowed_misses = int((1 - target_recall) * n_pos)
+    return known[min(allowed_misses, len(known) - 1)] * margin
+
+
+def check_probes(green_texts, model):
+    """
+    Appends each probe to Green texts and returns the combinations that
+    would still skip the ensemble (should be empty).
+    """
+    leaks = []
+    for probe in PROBES:
+        if not first_stage_unseen_tokens(probe, model["vocab"]):
+            # Probe became part of the training data, it proves nothing
+            continue
+        for text in green_texts:
+            probed = f"{text} {probe}"
+            if first_stage_is_green(probed, model):
+                leaks.append(probed)
+    return leaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the cascade first-stage model")
+    parser.add_argument("--comments", default=COMMENTS_PATH, help="Path to comments3.csv")
+    parser.add_argument("--from-db", action="store_true", help="Also train on logged MESSAGE rows")
+    parser.add_argument("--target-recall", type=float, default=1.0, help="Recall to keep on non-Green texts")
+    parser.add_argument("--margin", type=float, default=0.9, help="Safety factor applied to the threshold")
+    parser.add_argument("--min-known", type=int, default=10, help="Held-out bullying texts with only known tokens needed to calibrate")
+    parser.add_argument("--holdout", type=float, default=0.3, help="Share of examples held out for calibration and the report")
+    args = parser.parse_args()
+
+    examples = load_comments(args.comments)
+    if args.from_db:
+        examples += load_messages()
+
+    texts = [e["text"] for e in examples]
+    labels = [1 if needs_ensemble(e) else 0 for e in examples]
+
+    # Train on one split; calibrate and report on the held-out split
+    # using the same model that is saved
+    train_idx, holdout_idx = split_holdout(labels, args.holdout)
+    weights, bias = train([texts[i] for i in train_idx], [labels[i] for i in train_idx])
+    # Hashed unigram tokens seen in training; anything else is escalated
+    vocab = set()
+    for i in train_idx:
+        vocab.update(token_indices(texts[i]))
+    model = {"weights": weights, "bias": bias, "vocab": vocab}
+
+    holdout = [examples[i] for i in holdout_idx]
+    holdout_texts = [texts[i] for i in holdout_idx]
+    holdout_labels = [labels[i] for i in holdout_idx]
+    model["threshold"] = calibrate(holdout_texts, holdout_labels, model, args.target_recall, args.margin, args.min_known)
+    threshold = model["threshold"]
+
+    # Evaluation report: saved model and full gate on the held-out split
+    skipped = [e for e in holdout if first_stage_is_green(e["text"], model)]
+    unseen = sum(1 for t in holdout_texts if first_stage_unseen_tokens(t, vocab))
+    zone_changes = [{"text": e["text"], "ensemble_zone": e["zone"]} for e in skipped if e["zone"] != "Green Zone"]
+    missed_bullying = [e["text"] for e in skipped if e["human_bullying"]]
+    non_green = sum(1 for e in holdout if e["zone"] != "Green Zone")
+    green_texts = [e["text"] for e in holdout if e["zone"] == "Green Zone"] + [texts[i] for i in train_idx if not labels[i]]
+    probe_leaks = check_probes(green_texts, model)
+    report = {
+        "train_examples": len(train_idx),
+        "holdout_examples": len(holdout),
+        "threshold": threshold,
+        "escalated_unseen_tokens": unseen,
+        "skipped": len(skipped),
+        "skipped_fraction": round(len(skipped) / len(holdout), 3) if holdout else 0.0,
+        "non_green_recall": round(1 - len(zone_changes) / non_green, 3) if non_green else 1.0,
+        "zone_changes": zone_changes,
+        "missed_human_bullying": missed_bullying,
+        "probe_leaks": probe_leaks,
+    }
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    if probe_leaks:
+        raise SystemExit(f"Probe check failed, unseen insults skipped the ensemble (model not saved): {probe_leaks}")
+
+    with open(FIRST_STAGE_PATH, "w") as f:
+        json.dump({
+            "dim": FIRST_STAGE_DIM,
+            "bias": bias,
+            "threshold": threshold,
+            "vocab": sorted(vocab),
+            "weights": {str(i): round(w, 6) for i, w in weights.items()},
+        }, f)
+
+    print(f"Model saved to {FIRST_STAGE_PATH}")
+    print(f"Threshold: {threshold:.4f}")
+    print(f"Held-out skipped: {report['skipped']}/{report['holdout_examples']} ({report['skipped_fraction']:.1%}), unseen tokens: {unseen}")
+    print(f"Non-Green recall: {report['non_green_recall']:.1%}, zone changes: {len(zone_changes)}")
+    print(f"Report saved to {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()